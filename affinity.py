@@ -0,0 +1,106 @@
+import functools
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Set
+
+if TYPE_CHECKING:
+    from appdaemon.adapi import ADAPI
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPlanner:
+    """Assigns all the apps of a room to the same AppDaemon worker thread.
+
+    Keeping a room on one thread serializes the callbacks of its `RoomController`, `Motion`, `Door` and `Button` apps
+    without needing any locks. AppDaemon fixes the thread of each callback when it gets registered, so a room is
+    placed when the first of its apps registers and keeps that thread for as long as any of its apps are running. Once
+    all of them have terminated, the room gets placed again on the next initialize.
+
+    Costs are only measured while AppDaemon is running, so the rooms placed at startup are spread evenly by count.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.lock = threading.Lock()
+        self.apps: Dict[str, Set[str]] = defaultdict(set)
+        self.costs: Dict[str, float] = {}
+        self.plan: Dict[str, int] = {}
+
+    def register(self, room: str, app: 'ADAPI') -> Optional[int]:
+        """Adds an app to a room and returns the thread that the app needs to be pinned to.
+
+        Returns None if AppDaemon doesn't have any threads reserved for pinned apps.
+        """
+        n_threads = app.AD.threading.pin_threads
+        if not n_threads:
+            return None
+
+        with self.lock:
+            self.apps[room].add(app.name)
+            if (thread := self.plan.get(room)) is None:
+                thread = self.plan[room] = self._least_loaded(n_threads)
+                logger.debug(f'Placed {room} on thread {thread}')
+            return thread
+
+    def unregister(self, room: str, app: 'ADAPI'):
+        """Removes an app from a room, which frees the room to be placed again once none of its apps are left"""
+        with self.lock:
+            apps = self.apps.get(room, set())
+            apps.discard(app.name)
+            if not apps:
+                self.apps.pop(room, None)
+                self.plan.pop(room, None)
+
+    def pin(self, room: str, app: 'ADAPI') -> Optional[int]:
+        """Registers a synchronous app and pins it to the room's thread"""
+        if (thread := self.register(room, app)) is not None:
+            app.set_app_pin(True)
+            app.set_pin_thread(thread)
+        return thread
+
+    async def async_pin(self, room: str, app: 'ADAPI') -> Optional[int]:
+        """Registers an async app and pins it to the room's thread"""
+        if (thread := self.register(room, app)) is not None:
+            await app.set_app_pin(True)
+            await app.set_pin_thread(thread)
+        return thread
+
+    def record(self, room: str, seconds: float):
+        """Updates the moving average of the callback cost for a room"""
+        with self.lock:
+            if (cost := self.costs.get(room)) is None:
+                self.costs[room] = seconds
+            else:
+                self.costs[room] = cost + self.alpha * (seconds - cost)
+
+    def _least_loaded(self, n_threads: int) -> int:
+        """Finds the thread with the lowest total cost of the rooms already placed on it.
+
+        Rooms without any measurements yet are assumed to cost the average of the measured ones.
+        """
+        default = sum(self.costs.values()) / len(self.costs) if self.costs else 1.0
+        loads = [0.0] * n_threads
+        for room, thread in self.plan.items():
+            if thread < n_threads:
+                loads[thread] += self.costs.get(room, default)
+        return min(range(n_threads), key=loads.__getitem__)
+
+
+planner = ThreadPlanner()
+
+
+def timed(func: Callable) -> Callable:
+    """Decorator for `RoomController` methods that records how long they take in the planner"""
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            planner.record(self.name, time.perf_counter() - start)
+
+    return wrapper
@@ -2,6 +2,7 @@ import json
 from dataclasses import dataclass
 from typing import List
 
+from affinity import planner
 from appdaemon.plugins.mqtt.mqttapi import Mqtt
 from console import setup_component_logging
 from model import ButtonConfig
@@ -19,11 +20,15 @@ class Button(Mqtt):
         self.config = ButtonConfig(**self.args)
         setup_component_logging(self)
         self.app: RoomController = await self.get_app(self.args['app'])
+        await planner.async_pin(self.args['app'], self)
         self.log(f'Connected to AD app [room]{self.app.name}[/]', level='DEBUG')
 
         self.button = self.config.button
         self.setup_buttons(self.button)
 
+    def terminate(self):
+        planner.unregister(self.args['app'], self)
+
     def setup_buttons(self, buttons):
         if isinstance(buttons, list):
             for button in buttons:
@@ -0,0 +1,322 @@
+"""Append-only binary journal of room events.
+
+Events are packed into fixed-size records in a memory-mapped file. Callbacks only put the event on a queue; a
+background thread packs the records and flushes them to disk in batches. When a file is full it gets rotated to
+`<path>.1`, `<path>.2`, etc.
+
+Query it with::
+
+    python journal.py journal.rcj --room kitchen --cause motion --since 2024-01-01T18:00
+"""
+
+import argparse
+import logging
+import mmap
+import queue
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from datetime import time as dt_time
+from enum import IntEnum
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'RCJ1'
+VERSION = 1
+
+# magic, version, record size, record count
+HEADER = struct.Struct('<4sHHQ')
+# timestamp, state time (seconds after midnight, -1 if none), kind, entity count, room, cause, entities
+RECORD = struct.Struct('<diBB2x24s56s160s')
+
+
+class Kind(IntEnum):
+    ACTIVATE = 0
+    DEACTIVATE = 1
+
+
+@dataclass
+class Event:
+    timestamp: float
+    state_time: Optional[dt_time]
+    kind: Kind
+    room: str
+    cause: str
+    entities: List[str]
+    n_entities: int
+
+    @classmethod
+    def from_record(cls, fields: tuple) -> 'Event':
+        timestamp, state_time, kind, n_entities, room, cause, entities = fields
+        if state_time >= 0:
+            state_time = dt_time(state_time // 3600, state_time // 60 % 60, state_time % 60)
+        else:
+            state_time = None
+        return cls(
+            timestamp=timestamp,
+            state_time=state_time,
+            kind=Kind(kind),
+            room=decode(room),
+            cause=decode(cause),
+            entities=[e for e in decode(entities).split(',') if e],
+            n_entities=n_entities,
+        )
+
+    def __str__(self) -> str:
+        ts = datetime.fromtimestamp(self.timestamp).strftime('%Y-%m-%d %I:%M:%S %p')
+        state_time = self.state_time.strftime('%I:%M:%S %p') if self.state_time is not None else '-'
+        entities = ','.join(self.entities)
+        if len(self.entities) < self.n_entities:
+            entities += f',+{self.n_entities - len(self.entities)}'
+        return f'{ts}  {self.room:>12}  {self.kind.name.lower():<10}  {state_time:>11}  {self.cause}  {entities}'
+
+
+def encode(s: str, size: int) -> bytes:
+    """Encodes and truncates a string to fit in a record field"""
+    return s.encode()[:size]
+
+
+def encode_list(s: str, size: int) -> bytes:
+    """Encodes a comma-separated string, dropping whole items from the end until it fits in a record field"""
+    b = s.encode()
+    if len(b) <= size:
+        return b
+    return b[: max(b.rfind(b',', 0, size + 1), 0)]
+
+
+def decode(b: bytes) -> str:
+    return b.rstrip(b'\0').decode(errors='ignore')
+
+
+class Journal:
+    def __init__(
+        self,
+        path: Path,
+        capacity: int = 65536,
+        keep: int = 4,
+        flush_interval: float = 5.0,
+        batch_size: int = 256,
+        close_timeout: float = 10.0,
+    ):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.keep = keep
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.close_timeout = close_timeout
+        self.warned = False
+
+        # opening here instead of in the writer thread makes a bad path fail in the app's initialize
+        self._open()
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name=f'journal-{self.path.name}', daemon=True)
+        self.thread.start()
+
+    def log(
+        self,
+        kind: Kind,
+        room: str,
+        cause: str,
+        state_time: Optional[dt_time] = None,
+        entities: Iterable[str] = (),
+    ):
+        """Queues an event to be written. Safe to call from any thread."""
+        if not self.thread.is_alive():
+            if not self.warned:
+                logger.error(f'Journal writer for {self.path} has stopped, dropping events')
+                self.warned = True
+            return
+
+        if state_time is not None:
+            state_time = state_time.hour * 3600 + state_time.minute * 60 + state_time.second
+        else:
+            state_time = -1
+        entities = list(entities)
+        self.queue.put((time.time(), state_time, kind, len(entities), room, cause, ','.join(entities)))
+
+    def close(self):
+        """Writes out everything that's been queued and stops the writer thread"""
+        self.queue.put(None)
+        self.thread.join(self.close_timeout)
+        if self.thread.is_alive():
+            logger.error(f'Journal writer for {self.path} did not stop within {self.close_timeout}s')
+
+    def _open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists() or self.path.stat().st_size < HEADER.size:
+            with self.path.open('wb') as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, 0))
+                f.truncate(HEADER.size + self.capacity * RECORD.size)
+
+        self.file = self.path.open('r+b')
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        magic, version, size, self.count = HEADER.unpack_from(self.mm)
+        if magic != MAGIC or version != VERSION or size != RECORD.size:
+            self._close()
+            raise ValueError(f'Not a version {VERSION} journal file: {self.path}')
+        self.file_capacity = (len(self.mm) - HEADER.size) // RECORD.size
+
+    def _close(self):
+        self.mm.flush()
+        self.mm.close()
+        self.file.close()
+
+    def _rotate(self):
+        self._close()
+        for i in range(self.keep, 0, -1):
+            src = self.path.with_name(f'{self.path.name}.{i - 1}') if i > 1 else self.path
+            if src.exists():
+                src.replace(self.path.with_name(f'{self.path.name}.{i}'))
+        if self.keep == 0:
+            self.path.unlink()
+        self._open()
+
+    def _write(self, batch: List[tuple]):
+        try:
+            for timestamp, state_time, kind, n_entities, room, cause, entities in batch:
+                if self.count >= self.file_capacity:
+                    HEADER.pack_into(self.mm, 0, MAGIC, VERSION, RECORD.size, self.count)
+                    self._rotate()
+                RECORD.pack_into(
+                    self.mm,
+                    HEADER.size + self.count * RECORD.size,
+                    timestamp,
+                    state_time,
+                    kind,
+                    min(n_entities, 255),
+                    encode(room, 24),
+                    encode(cause, 56),
+                    encode_list(entities, 160),
+                )
+                self.count += 1
+        finally:
+            # the count goes in last so that readers never see a partially written record
+            HEADER.pack_into(self.mm, 0, MAGIC, VERSION, RECORD.size, self.count)
+            self.mm.flush()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                if (remaining := deadline - time.monotonic()) <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            stop = batch[-1] is None
+            events = batch[:-1] if stop else batch
+            try:
+                self._write(events)
+            except Exception:
+                logger.exception(f'Failed to write {len(events)} events to {self.path}')
+
+            if stop:
+                try:
+                    self._close()
+                except Exception:
+                    logger.exception(f'Failed to close {self.path}')
+                return
+
+
+_journals: Dict[Path, Journal] = {}
+_journal_refs: Dict[Path, int] = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path: Path, **kwargs) -> Journal:
+    """Returns the shared journal for a path, so that all the rooms in the same file use a single writer.
+
+    Each call needs a matching `release_journal` so that the journal gets closed after the last room is done with it.
+    """
+    path = Path(path).resolve()
+    with _journals_lock:
+        if (journal := _journals.get(path)) is None:
+            journal = _journals[path] = Journal(path, **kwargs)
+        _journal_refs[path] = _journal_refs.get(path, 0) + 1
+        return journal
+
+
+def release_journal(journal: Journal):
+    """Closes the journal, which writes out anything still queued, once nothing else is using it"""
+    with _journals_lock:
+        _journal_refs[journal.path] -= 1
+        if _journal_refs[journal.path] > 0:
+            return
+        del _journal_refs[journal.path], _journals[journal.path]
+    journal.close()
+
+
+def journal_files(path: Path) -> List[Path]:
+    """All the files of a journal, oldest first"""
+    path = Path(path)
+    rotated = sorted(
+        (p for p in path.parent.glob(f'{path.name}.*') if p.suffix[1:].isdigit()),
+        key=lambda p: int(p.suffix[1:]),
+        reverse=True,
+    )
+    return rotated + [path] if path.exists() else rotated
+
+
+def scan(
+    path: Path,
+    room: str = None,
+    cause: str = None,
+    since: datetime = None,
+    until: datetime = None,
+) -> Iterator[Event]:
+    """Yields the events from a journal file and its rotations that match all the given filters.
+
+    Filtering is done on the raw records, so only the matches get decoded.
+    """
+    room_b = encode(room, 24) if room is not None else None
+    cause_b = encode(cause, 56) if cause is not None else None
+    start = since.timestamp() if since is not None else float('-inf')
+    end = until.timestamp() if until is not None else float('inf')
+
+    for file in journal_files(path):
+        # the writer creates the file before the header gets written
+        if file.stat().st_size < HEADER.size:
+            continue
+
+        with file.open('rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, size, count = HEADER.unpack_from(mm)
+            if magic != MAGIC or version != VERSION or size != RECORD.size:
+                continue
+            count = min(count, (len(mm) - HEADER.size) // RECORD.size)
+
+            view = memoryview(mm)[HEADER.size : HEADER.size + count * RECORD.size]
+            try:
+                for fields in RECORD.iter_unpack(view):
+                    if not start <= fields[0] <= end:
+                        continue
+                    if room_b is not None and fields[4].rstrip(b'\0') != room_b:
+                        continue
+                    if cause_b is not None and cause_b not in fields[5]:
+                        continue
+                    yield Event.from_record(fields)
+            finally:
+                view.release()
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Query a room_control event journal')
+    parser.add_argument('path', type=Path, help='journal file')
+    parser.add_argument('--room', help='name of the RoomController app')
+    parser.add_argument('--cause', help='text contained in the cause')
+    parser.add_argument('--since', type=datetime.fromisoformat, help='ISO format start time')
+    parser.add_argument('--until', type=datetime.fromisoformat, help='ISO format end time')
+    args = parser.parse_args(argv)
+
+    for event in scan(args.path, room=args.room, cause=args.cause, since=args.since, until=args.until):
+        print(event)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,10 +10,22 @@ from rich.console import Console, ConsoleOptions, RenderResult
 from rich.table import Column, Table
 
 
+def parse_timedelta(input_str: str) -> timedelta:
+    """Parses a `HH:MM:SS` string, raising a `ValueError` if it's malformed or negative"""
+    if isinstance(input_str, timedelta):
+        if input_str < timedelta():
+            raise ValueError(f'Negative duration: {input_str}')
+        return input_str
+
+    hours, minutes, seconds = map(int, input_str.split(':'))
+    if hours < 0 or not 0 <= minutes < 60 or not 0 <= seconds < 60:
+        raise ValueError(f'Invalid duration: {input_str}')
+    return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+
+
 def str_to_timedelta(input_str: str) -> timedelta:
     try:
-        hours, minutes, seconds = map(int, input_str.split(':'))
-        return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+        return parse_timedelta(input_str)
     except Exception:
         return timedelta()
 
@@ -2,6 +2,7 @@ import re
 from datetime import timedelta
 from typing import Literal, Optional
 
+from affinity import planner
 from appdaemon.entity import Entity
 from appdaemon.plugins.hass.hassapi import Hass
 from console import setup_component_logging
@@ -44,6 +45,7 @@ class Motion(Hass):
     def initialize(self):
         setup_component_logging(self)
         self.app: RoomController = self.get_app(self.args['app'])
+        planner.pin(self.args['app'], self)
         self.log(f'Connected to AD app [room]{self.app.name}[/]', level='DEBUG')
 
         assert self.entity_exists(self.args['sensor'])
@@ -72,7 +74,10 @@ class Motion(Hass):
 
         if callbacks := self.callbacks():
             for handle, entry in callbacks.items():
-                self.log(f'Handle [yellow]{handle[:4]}[/]: {entry.function}')
+                self.log(f'Handle [yellow]{handle[:4]}[/]: {entry.function} on thread {entry.pin_thread}')
+
+    def terminate(self):
+        planner.unregister(self.args['app'], self)
 
     def callbacks(self):
         data = TypeAdapter(Callbacks).validate_python(self.get_callback_entries())
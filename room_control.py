@@ -1,13 +1,15 @@
 import datetime
 import logging
 from copy import deepcopy
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
+from affinity import planner, timed
 from appdaemon.entity import Entity
 from appdaemon.plugins.hass.hassapi import Hass
 from appdaemon.plugins.mqtt.mqttapi import Mqtt
 from console import console, setup_handler
-from model import ControllerStateConfig, RoomControllerConfig
+from journal import Kind, get_journal, release_journal
+from model import ControllerStateConfig, RoomControllerConfig, parse_timedelta
 
 logger = logging.getLogger(__name__)
 
@@ -38,20 +40,38 @@ class RoomController(Hass, Mqtt):
             self.logger.addHandler(setup_handler(room=self.name))
             # console.log(f'[yellow]Added RichHandler to {self.logger.name}[/]')
 
+        # needs to happen before any callbacks get registered
+        self.pin_room_thread()
+        # terminate still gets called if get_journal raises
+        self.journal = None
+        self.journal = get_journal(path) if (path := self.args.get('journal')) else None
         self.app_entities = self.gather_app_entities()
         # self.log(f'entities: {self.app_entities}')
+        self.transition_handles: Dict[datetime.time, str] = {}
         self.refresh_state_times()
         self.run_daily(callback=self.refresh_state_times, start='00:00:00')
+        self.listen_event(self.handle_reload, 'room_control_reload', app=self.name)
         self.log(f'Initialized [bold green]{type(self).__name__}[/]')
 
     def terminate(self):
         self.log('[bold red]Terminating[/]', level='DEBUG')
+        planner.unregister(self.name, self)
+        if self.journal is not None:
+            release_journal(self.journal)
+
+    def pin_room_thread(self):
+        """Pins the app to the same thread as the rest of the room's apps"""
+        if (thread := planner.pin(self.name, self)) is None:
+            self.log('No pin_threads configured, leaving the thread up to AppDaemon', level='DEBUG')
+        else:
+            self.log(f'Pinned to thread {thread}', level='DEBUG')
 
-    def gather_app_entities(self) -> List[str]:
+    def gather_app_entities(self, states: List[Dict] = None) -> List[str]:
         """Returns a list of all the entities involved in any of the states"""
+        states = states if states is not None else self.args['states']
 
         def generator():
-            for settings in deepcopy(self.args['states']):
+            for settings in deepcopy(states):
                 if scene := settings.get('scene'):
                     if isinstance(scene, str):
                         assert scene.startswith(
@@ -70,16 +90,13 @@ class RoomController(Hass, Mqtt):
 
         return set(list(generator()))
 
-    def refresh_state_times(self, *args, **kwargs):
-        """Resets the `self.states` attribute to a newly parsed version of the states.
+    def compile_config(self, args: Dict) -> RoomControllerConfig:
+        """Validates the app args into a new `RoomControllerConfig` with the state times resolved for the current day.
 
-        Parsed states have an absolute time for the current day.
+        Parsed states have an absolute time for the current day and are sorted latest first.
         """
-        # re-parse the state strings into times for the current day
-        self._room_config = RoomControllerConfig(**self.args)
-        self.log(f'{len(self._room_config.states)} states in the app configuration', level='DEBUG')
-
-        for state in self._room_config.states:
+        config = RoomControllerConfig(**args)
+        for state in config.states:
             if state.time is None and state.elevation is not None:
                 state.time = self.AD.sched.location.time_at_elevation(
                     elevation=state.elevation, direction=state.direction
@@ -89,29 +106,110 @@ class RoomController(Hass, Mqtt):
 
             assert isinstance(state.time, datetime.time), f'Invalid time: {state.time}'
 
+        config.sort_states()
+        return config
+
+    def refresh_state_times(self, *args, **kwargs):
+        """Resets the `self.states` attribute to a newly parsed version of the states.
+
+        Parsed states have an absolute time for the current day.
+        """
+        # re-parse the state strings into times for the current day
+        self._room_config = self.compile_config(self.args)
+        self.log(f'{len(self._room_config.states)} states in the app configuration', level='DEBUG')
+
         if self.logger.isEnabledFor(logging.DEBUG):
             # table = self._room_config.rich_table(self.name)
             console.print(self._room_config)
 
-        self.states = sorted(self.states, key=lambda s: s.time, reverse=True)
+        self.schedule_transitions()
+
+    def schedule_transitions(self, times: Iterable[datetime.time] = None):
+        """Schedules the remaining transitions for the current day and keeps their handles.
+
+        Schedules all the states if no times are given.
+        """
+        if times is None:
+            self.transition_handles = {}
+            times = [state.time for state in self.states]
 
-        # schedule the transitions
-        for state in self.states[::-1]:
-            # t: datetime.time = state['time']
-            t: datetime.time = state.time
+        for t in sorted(times):
             try:
-                self.run_at(callback=self.activate_any_on, start=t.strftime('%H:%M:%S'), cause='scheduled transition')
+                handle = self.run_at(
+                    callback=self.activate_any_on,
+                    start=t.strftime('%H:%M:%S'),
+                    cause='scheduled transition',
+                )
             except ValueError:
                 # happens when the callback time is in the past
                 pass
             except Exception as e:
                 self.log(f'Failed with {type(e)}: {e}')
+            else:
+                self.transition_handles[t] = handle
+
+    def cancel_transitions(self, times: Iterable[datetime.time]):
+        """Cancels the transitions at the given times that haven't fired yet"""
+        for t in times:
+            if (handle := self.transition_handles.pop(t, None)) is not None and self.timer_running(handle):
+                self.cancel_timer(handle)
+
+    def reload(self, config: Dict) -> bool:
+        """Swaps in a new room configuration without re-initializing the app.
+
+        Only the `states`, `off_duration` and `sleep_state` keys can be changed. Nothing is changed if the new
+        configuration fails to validate, including any off duration that isn't a valid `HH:MM:SS`. Listeners,
+        including the off timers of the `Motion` apps, are left intact; only the scheduled transitions whose times
+        changed get replaced.
+
+        Returns:
+            bool: Whether the new configuration was applied
+        """
+        if not config:
+            self.log('Nothing to reload', level='WARNING')
+            return False
+
+        if unknown := set(config) - {'states', 'off_duration', 'sleep_state'}:
+            self.log(f'Cannot hot reload {sorted(unknown)}', level='ERROR')
+            return False
+
+        new_args = {**self.args, **config}
+        try:
+            # the model silently turns malformed off durations into 0s, which would turn the lights off immediately
+            durations = [config.get('off_duration'), (config.get('sleep_state') or {}).get('off_duration')]
+            durations.extend(state.get('off_duration') for state in config.get('states', []))
+            for duration in durations:
+                if duration is not None:
+                    parse_timedelta(duration)
+
+            new_config = self.compile_config(new_args)
+            new_entities = self.gather_app_entities(new_args['states'])
+        except Exception as e:
+            self.log(f'Rejected new config with {type(e).__name__}: {e}', level='ERROR')
+            return False
+
+        old_times = {state.time for state in self.states}
+        new_times = {state.time for state in new_config.states}
+        self.args.update(config)
+        self._room_config, self.app_entities = new_config, new_entities
+        # transitions look up the current state when they fire, so only the ones at a different time need to change
+        self.cancel_transitions(old_times - new_times)
+        self.schedule_transitions(new_times - old_times)
+        self.log(f'Reloaded [bold green]{", ".join(sorted(config))}[/]')
+
+        if self.logger.isEnabledFor(logging.DEBUG):
+            console.print(self._room_config)
+        return True
+
+    def handle_reload(self, event_name, data, kwargs):
+        """Callback for the `room_control_reload` event. The event data holds the new values of the config keys"""
+        self.reload({key: data[key] for key in ('states', 'off_duration', 'sleep_state') if key in data})
 
     def current_state(self, now: datetime.time = None) -> ControllerStateConfig:
         if self.sleep_bool():
             self.log('sleep: active')
-            if state := self.args.get('sleep_state'):
-                return ControllerStateConfig(**state)
+            if state := self._room_config.sleep_state:
+                return state
             else:
                 return ControllerStateConfig(scene={})
         else:
@@ -178,6 +276,7 @@ class RoomController(Hass, Mqtt):
             now = now or self.get_now().time()
             return self._room_config.current_off_duration(now)
 
+    @timed
     def activate(self, entity=None, attribute=None, old=None, new=None, kwargs=None):
         if kwargs is not None:
             cause = kwargs.get('cause', 'unknown')
@@ -185,7 +284,8 @@ class RoomController(Hass, Mqtt):
             cause = 'unknown'
 
         self.log(f'Activating: {cause}')
-        scene_kwargs = self.current_state().to_apply_kwargs(transition=0)
+        state = self.current_state()
+        scene_kwargs = state.to_apply_kwargs(transition=0)
 
         if isinstance(scene_kwargs, str):
             self.turn_on(scene_kwargs)
@@ -193,6 +293,7 @@ class RoomController(Hass, Mqtt):
 
         elif isinstance(scene_kwargs, dict):
             self.call_service('scene/apply', **scene_kwargs)
+            self.journal_event(Kind.ACTIVATE, cause, state.time, scene_kwargs['entities'])
             if self.logger.isEnabledFor(logging.INFO):
                 self.log('Applied scene:')
                 console.print(scene_kwargs['entities'])
@@ -224,9 +325,19 @@ class RoomController(Hass, Mqtt):
         else:
             self.activate(*args, **kwargs)
 
+    @timed
     def deactivate(self, entity=None, attribute=None, old=None, new=None, kwargs=None):
         cause = kwargs.get('cause', 'unknown')
         self.log(f'Deactivating: {cause}')
         for e in self.app_entities:
             self.turn_off(e)
             self.log(f'Turned off {e}')
+        self.journal_event(Kind.DEACTIVATE, cause, entities=self.app_entities)
+
+    def journal_event(self, kind: Kind, cause: str, state_time: datetime.time = None, entities=()):
+        """Records the event in the journal, if the app has one configured"""
+        if self.journal is not None:
+            # the sleep state never gets its time resolved
+            if not isinstance(state_time, datetime.time):
+                state_time = None
+            self.journal.log(kind, self.name, cause, state_time, entities)
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the apps are imported as top-level modules by AppDaemon
+sys.path.insert(0, str(Path(__file__).parents[1]))
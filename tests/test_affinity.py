@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+from affinity import ThreadPlanner
+
+
+class FakeApp:
+    def __init__(self, name: str, pin_threads: int = 2):
+        self.name = name
+        self.AD = SimpleNamespace(threading=SimpleNamespace(pin_threads=pin_threads))
+        self.pinned = None
+
+    def set_app_pin(self, pin: bool):
+        pass
+
+    def set_pin_thread(self, thread: int):
+        self.pinned = thread
+
+
+def test_least_loaded_uses_costs():
+    planner = ThreadPlanner()
+    planner.record('kitchen', 5.0)
+    planner.record('bedroom', 1.0)
+    planner.record('office', 1.0)
+    assert planner.register('kitchen', FakeApp('kitchen')) == 0
+    assert planner.register('bedroom', FakeApp('bedroom')) == 1
+    assert planner.register('office', FakeApp('office')) == 1
+
+
+def test_least_loaded_defaults_to_average_cost():
+    planner = ThreadPlanner()
+    planner.record('kitchen', 4.0)
+    assert planner.register('kitchen', FakeApp('kitchen')) == 0
+    # unmeasured rooms count as the average of the measured ones
+    assert planner.register('bedroom', FakeApp('bedroom')) == 1
+    assert planner.register('office', FakeApp('office')) == 0
+    assert planner._least_loaded(2) == 1
+
+
+def test_room_apps_share_thread():
+    planner = ThreadPlanner()
+    planner.register('kitchen', FakeApp('kitchen'))
+    motion = FakeApp('kitchen_motion')
+    assert planner.pin('bedroom', FakeApp('bedroom')) == 1
+    assert planner.pin('kitchen', motion) == 0
+    assert motion.pinned == 0
+
+
+def test_async_pin():
+    class AsyncApp(FakeApp):
+        async def set_app_pin(self, pin: bool):
+            pass
+
+        async def set_pin_thread(self, thread: int):
+            self.pinned = thread
+
+    app = AsyncApp('kitchen_door')
+    assert asyncio.run(ThreadPlanner().async_pin('kitchen', app)) == 0
+    assert app.pinned == 0
+
+
+def test_no_pin_threads():
+    planner = ThreadPlanner()
+    app = FakeApp('kitchen', pin_threads=0)
+    assert planner.pin('kitchen', app) is None
+    assert app.pinned is None
+    assert 'kitchen' not in planner.plan
+
+
+def test_unregister_keeps_live_room():
+    planner = ThreadPlanner()
+    controller, motion = FakeApp('kitchen'), FakeApp('kitchen_motion')
+    planner.register('kitchen', controller)
+    planner.register('kitchen', motion)
+
+    planner.unregister('kitchen', controller)
+    assert planner.plan == {'kitchen': 0}
+
+    planner.unregister('kitchen', motion)
+    assert planner.plan == {}
+    assert 'kitchen' not in planner.apps
@@ -0,0 +1,125 @@
+from datetime import datetime
+from datetime import time as dt_time
+
+import pytest
+
+from journal import HEADER, MAGIC, RECORD, Journal, Kind, get_journal, journal_files, release_journal, scan
+
+
+def write_events(path, n, **kwargs) -> Journal:
+    journal = Journal(path, flush_interval=0.01, **kwargs)
+    for i in range(n):
+        journal.log(
+            Kind.ACTIVATE if i % 2 else Kind.DEACTIVATE,
+            'kitchen' if i % 3 else 'bedroom',
+            f'motion {i}',
+            dt_time(7, 30, i),
+            ['light.a', 'light.b'],
+        )
+    journal.close()
+    return journal
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'journal.rcj'
+    write_events(path, 2)
+
+    events = list(scan(path))
+    assert [e.cause for e in events] == ['motion 0', 'motion 1']
+    assert events[0].kind == Kind.DEACTIVATE
+    assert events[0].room == 'bedroom'
+    assert events[1].state_time == dt_time(7, 30, 1)
+    assert events[1].entities == ['light.a', 'light.b']
+
+    magic, version, size, count = HEADER.unpack_from(path.read_bytes())
+    assert (magic, size, count) == (MAGIC, RECORD.size, 2)
+
+
+def test_rotation(tmp_path):
+    path = tmp_path / 'journal.rcj'
+    write_events(path, 8, capacity=3, keep=2)
+
+    assert [p.name for p in journal_files(path)] == ['journal.rcj.2', 'journal.rcj.1', 'journal.rcj']
+    assert [e.cause for e in scan(path)] == [f'motion {i}' for i in range(8)]
+
+
+def test_rotation_drops_oldest(tmp_path):
+    path = tmp_path / 'journal.rcj'
+    write_events(path, 8, capacity=3, keep=1)
+
+    assert [p.name for p in journal_files(path)] == ['journal.rcj.1', 'journal.rcj']
+    assert [e.cause for e in scan(path)] == [f'motion {i}' for i in range(3, 8)]
+
+
+def test_scan_filters(tmp_path):
+    path = tmp_path / 'journal.rcj'
+    write_events(path, 6)
+    events = list(scan(path))
+
+    assert [e.cause for e in scan(path, room='kitchen')] == ['motion 1', 'motion 2', 'motion 4', 'motion 5']
+    assert [e.cause for e in scan(path, room='kitch')] == []
+    assert [e.cause for e in scan(path, cause='motion 3')] == ['motion 3']
+
+    since = datetime.fromtimestamp(events[2].timestamp)
+    until = datetime.fromtimestamp(events[4].timestamp)
+    assert all(since.timestamp() <= e.timestamp <= until.timestamp() for e in scan(path, since=since, until=until))
+    assert len(list(scan(path, since=since))) >= 4
+    assert len(list(scan(path, until=until))) >= 5
+
+
+def test_truncated_entities(tmp_path):
+    path = tmp_path / 'journal.rcj'
+    entities = [f'light.living_room_{i}' for i in range(10)]
+    journal = Journal(path, flush_interval=0.01)
+    journal.log(Kind.ACTIVATE, 'living_room', 'motion on', entities=entities)
+    journal.close()
+
+    (event,) = scan(path)
+    assert event.n_entities == 10
+    assert 0 < len(event.entities) < 10
+    assert event.entities == entities[: len(event.entities)]
+    assert str(event).endswith(f',+{10 - len(event.entities)}')
+
+
+def test_invalid_files(tmp_path):
+    junk = tmp_path / 'junk'
+    junk.write_bytes(b'x' * 30)
+    with pytest.raises(ValueError):
+        Journal(junk)
+
+    newer = tmp_path / 'newer'
+    newer.write_bytes(HEADER.pack(MAGIC, 2, RECORD.size, 0) + bytes(RECORD.size))
+    with pytest.raises(ValueError):
+        Journal(newer)
+    assert list(scan(newer)) == []
+
+
+def test_scan_skips_short_files(tmp_path):
+    empty = tmp_path / 'empty'
+    empty.touch()
+    assert list(scan(empty)) == []
+
+    short = tmp_path / 'short'
+    short.write_bytes(MAGIC)
+    assert list(scan(short)) == []
+
+
+def test_shared_journal_closes_on_last_release(tmp_path):
+    path = tmp_path / 'journal.rcj'
+    first, second = get_journal(path), get_journal(path)
+    assert first is second
+
+    first.log(Kind.ACTIVATE, 'kitchen', 'motion on')
+    release_journal(first)
+    assert first.thread.is_alive()
+
+    release_journal(second)
+    assert not first.thread.is_alive()
+    assert [e.cause for e in scan(path)] == ['motion on']
+    third = get_journal(path)
+    assert third is not first
+    release_journal(third)
+
+
+def test_record_size():
+    assert RECORD.size == 256
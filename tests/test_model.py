@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip('pydantic')
+
+from model import parse_timedelta, str_to_timedelta  # noqa: E402
+
+
+def test_parse_timedelta():
+    assert parse_timedelta('01:02:03') == timedelta(hours=1, minutes=2, seconds=3)
+    assert parse_timedelta('00:00:00') == timedelta()
+    assert parse_timedelta(timedelta(minutes=5)) == timedelta(minutes=5)
+
+
+@pytest.mark.parametrize('value', ['-1:00:00', '00:-5:00', '00:00:-1', '00:60:00', '00:00:60', '5 minutes', '00:05'])
+def test_parse_timedelta_invalid(value):
+    with pytest.raises(ValueError):
+        parse_timedelta(value)
+
+
+def test_parse_timedelta_negative():
+    with pytest.raises(ValueError):
+        parse_timedelta(timedelta(seconds=-1))
+
+
+def test_str_to_timedelta_fallback():
+    assert str_to_timedelta('garbage') == timedelta()